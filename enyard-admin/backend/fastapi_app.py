@@ -1,11 +1,33 @@
+import base64
+import hashlib
+import inspect
+import io
+import json
+import logging
 import os
 import re
-from typing import Any, Dict, List, Optional
+import stat
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 import mysql.connector
-from mysql.connector import Error
-from fastapi import FastAPI, HTTPException, Query
+from anyio import to_thread
+from cachetools import TTLCache
+from mysql.connector import HAVE_CEXT, Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+import redis
+from redis.exceptions import RedisError
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -18,6 +40,38 @@ DB_HOST = os.getenv("MYSQL_HOST", "localhost")
 DB_USER = os.getenv("MYSQL_USER", "root")
 DB_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
 DB_NAME = os.getenv("MYSQL_DATABASE", "enyard_db")
+# autocommit: pooled connections are reused without a session reset, so a
+# read must not leave a transaction (and its stale snapshot) open.
+DB_CONFIG = dict(
+    host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, autocommit=True
+)
+# mysql.connector caps a pool at 32 connections
+DB_POOL_SIZE = min(int(os.getenv("MYSQL_POOL_SIZE", "20")), 32)
+# worker threads for the blocking `def` routes (anyio's default is 40). Kept
+# well above DB_POOL_SIZE: streaming bodies, static files and threads waiting
+# in get_conn() all take tokens, and get_conn() already caps DB connections.
+THREADPOOL_SIZE = max(int(os.getenv("THREADPOOL_SIZE", "100")), 40)
+# seconds get_conn() waits for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "5"))
+
+# Indexes the tracker's list queries rely on: (table, index name, columns).
+# snapshots.id is the primary key, so lookups by id need no extra index.
+INDEXES = [
+    ("snapshots", "idx_snap_emp_time", "employee_id, captured_at DESC, id"),
+    ("logs", "idx_log_emp_time", "employee_id, created_at DESC"),
+]
+
+# SHOW COLUMNS results are kept in-process for this many seconds. The cache
+# is per worker process, so this bounds how long a schema change can go
+# unnoticed by workers that did not receive DELETE /cache.
+SCHEMA_TTL = int(os.getenv("SCHEMA_TTL", "60"))
+
+# Redis response cache (leave REDIS_URL empty to disable)
+REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_PREFIX = "enyard"
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# seconds to wait for a free Redis connection before skipping the cache
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "0.1"))
 
 # CORS origins
 origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
@@ -27,11 +81,67 @@ from fastapi.staticfiles import StaticFiles
 
 # fastapi_app.py (after app = FastAPI(...))
 # Change the directory to wherever your images are saved
-SNAP_DIR = r"C:\Users\crmit\Desktop\enyard-admin\snapshots"   # example
+SNAP_DIR = os.getenv("SNAP_DIR", r"C:\Users\crmit\Desktop\enyard-admin\snapshots")   # example
+
+
 
+log = logging.getLogger(__name__)
 
+pool: Optional[MySQLConnectionPool] = None
+_pool_lock = threading.Lock()
+redis_client: Optional[redis.Redis] = None
+_schema_cache: TTLCache = TTLCache(maxsize=256, ttl=SCHEMA_TTL)
+_schema_lock = threading.Lock()
 
-app = FastAPI(title="MySQL Explorer API", version="1.0.0")
+def get_pool() -> MySQLConnectionPool:
+    global pool
+    if pool is None:
+        # lock only for creation, so concurrent first requests build one pool
+        with _pool_lock:
+            if pool is None:
+                pool = MySQLConnectionPool(
+                    pool_name="enyard", pool_size=DB_POOL_SIZE, pool_reset_session=False, **DB_CONFIG
+                )
+    return pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global redis_client
+    # Routes must stay plain `def`: mysql.connector blocks, and FastAPI only
+    # moves `def` routes off the event loop (FastAPI docs, "Concurrency and
+    # async / await" -> "In a hurry?"). An `async def` route would stall
+    # every other request while it waits on MySQL.
+    for route in app.routes:
+        if isinstance(route, APIRoute) and inspect.iscoroutinefunction(route.endpoint):
+            raise RuntimeError(f"Route {route.path} must be 'def', not 'async def'")
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # the connector picks its C extension by itself when it is installed; the
+    # pure-Python fallback decodes rows several times slower
+    if not HAVE_CEXT:
+        log.warning("mysql-connector C extension not available; using the pure-Python driver")
+    if REDIS_URL:
+        # one shared client; threads wait for a free connection instead of
+        # opening new ones past REDIS_MAX_CONNECTIONS
+        redis_client = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+            REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=0.5, socket_connect_timeout=0.5,
+        ))
+    try:
+        get_pool()
+    except Error:
+        pass  # DB not reachable yet; get_conn() retries on first request
+    yield
+    # Pooled MySQL connections are left to process exit: the connector has no
+    # public way to close idle pooled connections, and checking each one out
+    # would first reconnect any that had been dropped.
+    if redis_client is not None:
+        redis_client.close()
+
+
+app = FastAPI(
+    title="MySQL Explorer API", version="1.0.0", lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -44,20 +154,114 @@ app.mount("/snapshots", StaticFiles(directory=SNAP_DIR), name="snapshots")
 # --- Helpers ---
 
 def get_conn():
-    try:
-        return mysql.connector.connect(
-            host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME
-        )
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"DB connection failed: {e}")
+    # conn.close() on a pooled connection hands it back to the pool
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            return get_pool().get_connection()
+        except PoolError:
+            # pool exhausted: wait for a connection to be returned rather than
+            # opening connections beyond DB_POOL_SIZE
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=503, detail="DB connection pool exhausted")
+            time.sleep(0.01)
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"DB connection failed: {e}")
 
 SAFE_IDENT_RE = re.compile(r"^[a-zA-Z0-9_]+$")
+# column types the table_data search runs LIKE against
+TEXT_TYPES = ("char", "text", "enum", "set")
+INDEX_EXISTS_SQL = (
+    "SELECT 1 FROM information_schema.statistics"
+    " WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1"
+)
 
+@lru_cache(maxsize=256)
 def safe_ident(name: str) -> str:
     if not SAFE_IDENT_RE.match(name):
         raise HTTPException(status_code=400, detail="Invalid identifier")
     return f"`{name}`"
 
+def ensure_indexes():
+    """Create any missing INDEXES; tables that don't exist are skipped.
+
+    Index builds on large tables take a while, so this is a one-off step
+    (python fastapi_app.py migrate) rather than part of app startup.
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cur = conn.cursor()
+        for table, name, cols in INDEXES:
+            cur.execute(INDEX_EXISTS_SQL, [table, name])
+            if cur.fetchone():
+                continue
+            try:
+                cur.execute(f"CREATE INDEX {safe_ident(name)} ON {safe_ident(table)} ({cols})")
+                log.info("Created index %s on %s", name, table)
+            except Error as e:
+                log.warning("Could not create index %s on %s: %s", name, table, e)
+    finally:
+        conn.close()
+
+def get_table_schema(table: str) -> List[Dict[str, Any]]:
+    """SHOW COLUMNS rows (Field, Type, Null, Key, Default, Extra) for a table."""
+    with _schema_lock:
+        schema = _schema_cache.get(table)
+    if schema is None:
+        conn = get_conn()
+        try:
+            cur = conn.cursor(dictionary=True)
+            cur.execute(f"SHOW COLUMNS FROM {safe_ident(table)}")
+            schema = cur.fetchall()
+        finally:
+            conn.close()
+        with _schema_lock:
+            _schema_cache[table] = schema
+    return schema
+
+def cache_key(kind: str, table: str = "", *params: Any) -> str:
+    digest = hashlib.sha1(json.dumps(params, default=str).encode()).hexdigest()
+    return f"{CACHE_PREFIX}:{kind}:{table}:{digest}"
+
+def cache_mget(keys: List[str]) -> List[Any]:
+    """Fetch several cached payloads in one round-trip; misses are None."""
+    if redis_client is None:
+        return [None] * len(keys)
+    try:
+        hits = redis_client.mget(keys)
+    except RedisError:
+        return [None] * len(keys)
+    return [None if h is None else orjson.loads(h) for h in hits]
+
+def cached(key: str, ttl: int, load):
+    """Return load() through the Redis cache."""
+    hit = cache_mget([key])[0]
+    return hit if hit is not None else cache_fill(key, ttl, load)
+
+def cache_fill(key: str, ttl: int, load):
+    """Run load() and store the result under key; Redis failures are ignored."""
+    if redis_client is None:
+        return load()
+    value = jsonable_encoder(load())
+    try:
+        redis_client.set(key, orjson.dumps(value), ex=ttl)
+    except RedisError:
+        pass
+    return value
+
+def etag_response(request: Request, payload: Any) -> Response:
+    """JSON response tagged with a hash of its body; 304 if the client has it.
+
+    The tag is computed from the finished payload, so a 304 only saves the
+    body on the wire. The payload itself is still produced per request: from
+    Redis when the cache is on, otherwise by the full MySQL queries.
+    """
+    body = orjson.dumps(jsonable_encoder(payload))
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
 # --- Models ---
 class TablesResp(BaseModel):
     tables: List[str]
@@ -68,15 +272,44 @@ class ColumnsResp(BaseModel):
 class DataResp(BaseModel):
     columns: List[str]
     rows: List[List[Any]]
-    total: int
+    total: Optional[int]  # None on keyset pages
 
 # --- Endpoints ---
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.delete("/cache")
+def clear_cache(table: Optional[str] = None):
+    """Invalidate cached responses, for one table or for everything.
+
+    Redis entries are shared, but the schema cache is per worker: only the
+    worker handling this request drops it, the others refresh within
+    SCHEMA_TTL.
+    """
+    if table is not None:
+        safe_ident(table)
+    with _schema_lock:
+        if table is None:
+            _schema_cache.clear()
+        else:
+            _schema_cache.pop(table, None)
+    removed = 0
+    if redis_client is not None:
+        match = f"{CACHE_PREFIX}:*:{table}:*" if table else f"{CACHE_PREFIX}:*"
+        try:
+            keys = list(redis_client.scan_iter(match=match, count=500))
+            if keys:
+                removed = redis_client.delete(*keys)
+        except RedisError as e:
+            raise HTTPException(status_code=503, detail=f"Cache unavailable: {e}")
+    return {"removed": removed}
+
 @app.get("/tables", response_model=TablesResp)
-def list_tables():
+def list_tables(request: Request):
+    return etag_response(request, cached(cache_key("tables"), 60, _load_tables))
+
+def _load_tables():
     conn = get_conn()
     try:
         cur = conn.cursor()
@@ -87,38 +320,89 @@ def list_tables():
         conn.close()
 
 @app.get("/tables/{table}/columns", response_model=ColumnsResp)
-def table_columns(table: str):
-    conn = get_conn()
+def table_columns(request: Request, table: str):
+    safe_ident(table)
+    cols = cached(cache_key("columns", table), SCHEMA_TTL, lambda: _load_table_columns(table))
+    return etag_response(request, cols)
+
+def _load_table_columns(table: str):
+    # Normalize keys to lower-case
+    cols = [{k.lower(): v for k, v in c.items()} for c in get_table_schema(table)]
+    return {"columns": cols}
+
+def _prefetch(key: str, ttl: int, load):
     try:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(f"SHOW COLUMNS FROM {safe_ident(table)}")
-        cols = cur.fetchall()  # Field, Type, Null, Key, Default, Extra
-        # Normalize keys to lower-case
-        for c in cols:
-            for k in list(c.keys()):
-                c[k.lower()] = c.pop(k)
-        return {"columns": cols}
-    finally:
-        conn.close()
+        cache_fill(key, ttl, load)
+    except (Error, HTTPException):
+        pass  # the page is loaded normally if it is ever requested
 
 @app.get("/tables/{table}/data", response_model=DataResp)
 def table_data(
+    request: Request,
+    background: BackgroundTasks,
     table: str,
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
     order_by: Optional[str] = None,
     order_dir: str = Query("asc", pattern="^(?i)(asc|desc)$"),
     search: Optional[str] = None,
+    after: Optional[str] = None,
+    after_pk: Optional[str] = None,
 ):
+    """One page of rows.
+
+    Pages are addressed by offset, or by keyset when after_pk is given: pass
+    the primary key (and, with order_by, the order_by value as after) of
+    the last row seen; order_by must then be a NOT NULL column. Keyset
+    pages cost the same at any depth, whereas OFFSET N makes MySQL read and
+    discard N rows. Keyset pages skip the COUNT(*) as well, so their total
+    is None.
+    """
+    safe_ident(table)
+
+    def key(off: int) -> str:
+        return cache_key(
+            "data", table, limit, off, order_by, order_dir.lower(), search, after, after_pk
+        )
+
+    def load(off: int):
+        return lambda: _load_table_data(
+            table, limit, off, order_by, order_dir, search, after, after_pk
+        )
+
+    if after_pk is not None:
+        return etag_response(request, cached(key(0), 10, load(0)))
+
+    # look up this page and the next one together; warm the next page after
+    # responding so sequential paging is served from Redis
+    next_offset = offset + limit
+    page, next_page = cache_mget([key(offset), key(next_offset)])
+    if page is None:
+        page = cache_fill(key(offset), 10, load(offset))
+    if redis_client is not None and next_page is None and next_offset < page["total"]:
+        background.add_task(_prefetch, key(next_offset), 10, load(next_offset))
+    return etag_response(request, page)
+
+def _load_table_data(
+    table: str,
+    limit: int,
+    offset: int,
+    order_by: Optional[str],
+    order_dir: str,
+    search: Optional[str],
+    after: Optional[str] = None,
+    after_pk: Optional[str] = None,
+):
+    # the cached schema only validates order_by and picks search columns; the
+    # header comes from the data query so it always lines up with the rows
+    meta = get_table_schema(table)
+    cols = [m["Field"] for m in meta]
+    if not cols:
+        return {"columns": [], "rows": [], "total": 0}
+
     conn = get_conn()
     try:
         cur = conn.cursor()
-        # get columns
-        cur.execute(f"SHOW COLUMNS FROM {safe_ident(table)}")
-        cols = [r[0] for r in cur.fetchall()]
-        if not cols:
-            return {"columns": [], "rows": [], "total": 0}
-
         # validate order_by
         order_sql = ""
         if order_by:
@@ -130,42 +414,253 @@ def table_data(
         where_sql = ""
         params: List[Any] = []
         if search:
-            cur2 = conn.cursor(dictionary=True)
-            cur2.execute(f"SHOW COLUMNS FROM {safe_ident(table)}")
-            meta = cur2.fetchall()
-            text_cols = [m["Field"] for m in meta if any(t in str(m["Type"]).lower() for t in ["char", "text", "enum", "set"]) ]
+            text_cols = [m["Field"] for m in meta if any(t in str(m["Type"]).lower() for t in TEXT_TYPES)]
             if text_cols:
                 like_parts = [f"`{c}` LIKE %s" for c in text_cols]
                 where_sql = " WHERE (" + " OR ".join(like_parts) + ")"
                 params.extend([f"%{search}%"] * len(text_cols))
 
-        # total count
-        total_sql = f"SELECT COUNT(*) FROM {safe_ident(table)}{where_sql}"
-        cur.execute(total_sql, params)
-        total = cur.fetchone()[0]
+        # total count (a full scan, so keyset pages skip it)
+        total = None
+        if after_pk is None:
+            total_sql = f"SELECT COUNT(*) FROM {safe_ident(table)}{where_sql}"
+            cur.execute(total_sql, params)
+            total = cur.fetchone()[0]
 
         # data
-        sql = f"SELECT * FROM {safe_ident(table)}{where_sql}{order_sql} LIMIT %s OFFSET %s"
-        cur.execute(sql, params + [limit, offset])
+        if after_pk is not None:
+            pks = [m["Field"] for m in meta if m["Key"] in ("PRI", b"PRI")]
+            if len(pks) != 1:
+                raise HTTPException(status_code=400, detail="Keyset paging needs a single-column primary key")
+            pk, direction = pks[0], order_dir.upper()
+            op = "<" if direction == "DESC" else ">"
+            if order_by and order_by != pk:
+                if after is None:
+                    raise HTTPException(status_code=400, detail="after is required with order_by")
+                # (NULL, pk) > (x, y) is NULL, so rows with a NULL sort value
+                # would silently drop out of every keyset page
+                if any(m["Field"] == order_by and m["Null"] in ("YES", b"YES") for m in meta):
+                    raise HTTPException(status_code=400, detail="Keyset paging needs a NOT NULL order_by column")
+                keyset_sql = f"(`{order_by}`, `{pk}`) {op} (%s, %s)"
+                keyset_params = [after, after_pk]
+                order_sql = f" ORDER BY `{order_by}` {direction}, `{pk}` {direction}"
+            else:
+                keyset_sql = f"`{pk}` {op} %s"
+                keyset_params = [after_pk]
+                order_sql = f" ORDER BY `{pk}` {direction}"
+            keyset_where = f"{where_sql} AND {keyset_sql}" if where_sql else f" WHERE {keyset_sql}"
+            sql = f"SELECT * FROM {safe_ident(table)}{keyset_where}{order_sql} LIMIT %s"
+            cur.execute(sql, params + keyset_params + [limit])
+        else:
+            sql = f"SELECT * FROM {safe_ident(table)}{where_sql}{order_sql} LIMIT %s OFFSET %s"
+            cur.execute(sql, params + [limit, offset])
         rows = cur.fetchall()
 
-        return {"columns": cols, "rows": [list(r) for r in rows], "total": total}
+        return {"columns": list(cur.column_names), "rows": [list(r) for r in rows], "total": total}
     finally:
         conn.close()
 # fastapi_app.py
-from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+# snapshot files are copied into zip downloads in slices of this size
+FILE_CHUNK = 256 * 1024
 
 @app.get("/blob/{table}/{id_col}/{id_value}")
-def get_blob(table: str, id_col: str, id_value: str, column: str = "snapshot_blob", mime: str = "image/jpeg"):
-    safe_ident(table); safe_ident(id_col); safe_ident(column)
+def get_blob(request: Request, table: str, id_col: str, id_value: str, column: str = "snapshot_blob", mime: str = "image/jpeg"):
+    tbl, key, col = safe_ident(table), safe_ident(id_col), safe_ident(column)
     conn = get_conn()
     try:
         cur = conn.cursor()
-        sql = f"SELECT {safe_ident(column)} FROM {safe_ident(table)} WHERE {safe_ident(id_col)} = %s LIMIT 1"
+        sql = f"SELECT {col} FROM {tbl} WHERE {key} = %s LIMIT 1"
         cur.execute(sql, [id_value])
         row = cur.fetchone()
-        if not row or row[0] is None:
-            raise HTTPException(status_code=404, detail="Image not found")
-        return Response(content=row[0], media_type=mime)
     finally:
         conn.close()
+    if not row or row[0] is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # The value is read whole in one query so body, length and ETag agree.
+    # The C extension returns bytes, so this is normally not a copy.
+    value = row[0]
+    data = value if isinstance(value, bytes) else (
+        value.encode() if isinstance(value, str) else bytes(value)
+    )
+    # binary payloads skip Redis; let browsers and proxies cache them instead
+    headers = {"Cache-Control": "public, max-age=300", "ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=mime, headers=headers)
+
+# jsonable_encoder would otherwise try to decode binary columns as UTF-8
+BINARY_ENCODER = {
+    bytes: lambda b: base64.b64encode(b).decode("ascii"),
+    bytearray: lambda b: base64.b64encode(b).decode("ascii"),
+}
+
+@app.get("/tables/{table}/export")
+def export_table(table: str, order_by: Optional[str] = None,
+                 order_dir: str = Query("asc", pattern="^(?i)(asc|desc)$")):
+    """Stream every row of a table as NDJSON, one JSON object per line.
+
+    Binary values (BLOBs) are written as base64 strings.
+    """
+    tbl = safe_ident(table)
+    cols = [m["Field"] for m in get_table_schema(table)]
+    order_sql = ""
+    if order_by:
+        if order_by not in cols:
+            raise HTTPException(status_code=400, detail="Invalid order_by column")
+        order_sql = f" ORDER BY `{order_by}` {order_dir.upper()}"
+
+    # Check out and run the query before streaming starts, so a pool timeout
+    # or a bad table still produces a proper error response instead of a 200.
+    conn = get_conn()
+    try:
+        # unbuffered: rows are pulled from the server as they are sent
+        cur = conn.cursor(dictionary=True, buffered=False)
+        cur.execute(f"SELECT * FROM {tbl}{order_sql}")
+    except BaseException:
+        conn.close()
+        raise
+
+    def rows():
+        finished = False
+        try:
+            yield b""  # consumed below, so this finally runs even if never streamed
+            for row in cur:
+                yield orjson.dumps(jsonable_encoder(row, custom_encoder=BINARY_ENCODER)) + b"\n"
+            cur.close()
+            finished = True
+        finally:
+            if not finished:
+                # Stopped early (client went away): unread rows would make the
+                # connection unusable, so drop its socket. The pool reconnects
+                # it on the next checkout.
+                try:
+                    conn.disconnect()
+                except Error:
+                    pass
+            conn.close()
+
+    body = rows()
+    next(body)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+# --- Snapshot files ---
+MAX_BATCH_IDS = 500
+
+def snapshot_paths(ids: List[int]) -> Dict[int, str]:
+    """Look up filepaths for many snapshot ids in one query."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        marks = ",".join(["%s"] * len(ids))
+        cur.execute(f"SELECT id, filepath FROM snapshots WHERE id IN ({marks})", ids)
+        return {row[0]: row[1] for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+# resolved path + stat per stored filepath, so repeat downloads skip the syscalls
+_file_cache: TTLCache = TTLCache(maxsize=1024, ttl=5)
+_file_lock = threading.Lock()
+
+def snapshot_file(filepath: str) -> Optional[Tuple[str, os.stat_result]]:
+    """Resolve a stored filepath to (path, stat) of a file under SNAP_DIR, or None."""
+    with _file_lock:
+        if filepath in _file_cache:
+            return _file_cache[filepath]
+    root = os.path.realpath(SNAP_DIR)
+    path = os.path.realpath(os.path.join(root, filepath))
+    found = None
+    try:
+        # commonpath, unlike startswith, also rejects siblings like snapshots_evil/
+        if os.path.commonpath([path, root]) == root:
+            st = os.stat(path)
+            if stat.S_ISREG(st.st_mode):
+                found = (path, st)
+    except (ValueError, OSError):  # different drives on Windows, or missing file
+        pass
+    with _file_lock:
+        _file_cache[filepath] = found
+    return found
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target whose output can be drained while zipping."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+@app.get("/snapshot-paths")
+def resolve_snapshots(ids: List[int] = Query(...)):
+    return snapshot_paths(ids)
+
+@app.get("/snapshot-paths/zip")
+def download_snapshots(ids: List[int] = Query(...)):
+    files = [
+        (sid, found)
+        for sid, fp in snapshot_paths(ids).items()
+        if fp and (found := snapshot_file(fp))
+    ]
+    if not files:
+        raise HTTPException(status_code=404, detail="No snapshot files found")
+
+    def stream():
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+            for sid, (path, st) in files:
+                # built from the cached stat instead of letting zf.write() stat again
+                info = zipfile.ZipInfo(
+                    f"{sid}_{os.path.basename(path)}", date_time=time.localtime(st.st_mtime)[:6]
+                )
+                info.file_size = st.st_size
+                with open(path, "rb") as src, zf.open(info, "w") as dst:
+                    while chunk := src.read(FILE_CHUNK):
+                        dst.write(chunk)
+                        yield sink.drain()
+        yield sink.drain()
+
+    return StreamingResponse(
+        stream(), media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="snapshots.zip"'},
+    )
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["migrate"]:
+        logging.basicConfig(level=logging.INFO)
+        ensure_indexes()
+        sys.exit()
+
+    import uvicorn
+
+    # Every worker opens its full MySQL pool at startup, so the server holds
+    # WEB_CONCURRENCY * MYSQL_POOL_SIZE connections (2 * 20 by default); keep
+    # that below MySQL's max_connections (151 by default).
+    # loop/http "auto" pick uvloop and httptools when installed (uvicorn[standard]);
+    # uvloop has no Windows build, where asyncio's loop is used instead.
+    uvicorn.run(
+        "fastapi_app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "2")),
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        timeout_keep_alive=30,
+    )
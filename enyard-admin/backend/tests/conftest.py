@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# fastapi_app mounts SNAP_DIR and reads .env at import time
+os.environ["SNAP_DIR"] = tempfile.mkdtemp()
+os.environ["REDIS_URL"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    """Records executed SQL and replays canned result sets in order."""
+
+    def __init__(self, results, column_names=()):
+        self.results = list(results)
+        self.column_names = tuple(column_names)
+        self.executed = []
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, list(params or [])))
+        self._rows = self.results.pop(0) if self.results else []
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, cursor):
+        self.cur = cursor
+        self.closed = 0
+
+    def cursor(self, **kwargs):
+        return self.cur
+
+    def close(self):
+        self.closed += 1
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    import fastapi_app
+
+    monkeypatch.setattr(fastapi_app, "redis_client", None)
+    return fastapi_app
+
+
+@pytest.fixture
+def fake_db(app_module, monkeypatch):
+    """Install a fake connection; returns a setter taking the cursor's results."""
+
+    def install(results, column_names=(), schema=None):
+        cur = FakeCursor(results, column_names)
+        conn = FakeConn(cur)
+        monkeypatch.setattr(app_module, "get_conn", lambda: conn)
+        if schema is not None:
+            monkeypatch.setattr(app_module, "get_table_schema", lambda table: schema)
+        return conn
+
+    return install
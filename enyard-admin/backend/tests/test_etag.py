@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+
+def test_tables_etag_roundtrip(app_module, fake_db):
+    conn = fake_db([[("logs",), ("snapshots",)]] * 2)
+    client = TestClient(app_module.app)
+
+    first = client.get("/tables")
+    assert first.status_code == 200
+    assert first.json() == {"tables": ["logs", "snapshots"]}
+    etag = first.headers["etag"]
+
+    again = client.get("/tables", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    # without Redis the payload is rebuilt, so MySQL is still queried
+    assert len(conn.cur.executed) == 2
+
+
+def test_changed_payload_gets_new_etag(app_module, fake_db):
+    fake_db([[("logs",)], [("logs",), ("users",)]])
+    client = TestClient(app_module.app)
+    etag = client.get("/tables").headers["etag"]
+    changed = client.get("/tables", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
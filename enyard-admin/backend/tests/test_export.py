@@ -0,0 +1,34 @@
+import orjson
+from fastapi.testclient import TestClient
+from mysql.connector import ProgrammingError
+
+SCHEMA = [{"Field": "id"}, {"Field": "snapshot_blob"}]
+
+
+def test_export_streams_ndjson_with_base64_blobs(app_module, fake_db):
+    conn = fake_db([[{"id": 1, "snapshot_blob": b"\xff\x00"}, {"id": 2, "snapshot_blob": None}]],
+                   schema=SCHEMA)
+    resp = TestClient(app_module.app).get("/tables/snapshots/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in resp.content.splitlines()]
+    assert lines == [{"id": 1, "snapshot_blob": "/wA="}, {"id": 2, "snapshot_blob": None}]
+    assert conn.closed == 1
+
+
+def test_export_query_error_is_not_a_200(app_module, fake_db):
+    conn = fake_db([], schema=SCHEMA)
+
+    def fail(sql, params=None):
+        raise ProgrammingError("Table 'enyard_db.snapshots' doesn't exist")
+
+    conn.cur.execute = fail
+    resp = TestClient(app_module.app, raise_server_exceptions=False).get("/tables/snapshots/export")
+    assert resp.status_code == 500
+    assert conn.closed == 1
+
+
+def test_export_rejects_unknown_order_by(app_module, fake_db):
+    fake_db([], schema=SCHEMA)
+    resp = TestClient(app_module.app).get("/tables/snapshots/export?order_by=nope")
+    assert resp.status_code == 400
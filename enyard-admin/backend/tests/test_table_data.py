@@ -0,0 +1,74 @@
+import pytest
+from fastapi import HTTPException
+
+SCHEMA = [
+    {"Field": "id", "Type": "int", "Null": "NO", "Key": "PRI"},
+    {"Field": "title", "Type": "varchar(255)", "Null": "NO", "Key": ""},
+    {"Field": "note", "Type": "text", "Null": "YES", "Key": ""},
+]
+
+
+def load(app_module, **kwargs):
+    args = dict(
+        table="snapshots", limit=10, offset=0, order_by=None, order_dir="asc",
+        search=None, after=None, after_pk=None,
+    )
+    args.update(kwargs)
+    return app_module._load_table_data(**args)
+
+
+def test_offset_page_counts_and_uses_offset(app_module, fake_db):
+    conn = fake_db([[(42,)], [(1, "a", None)]], ("id", "title", "note"), SCHEMA)
+    page = load(app_module, offset=20)
+    count, data = conn.cur.executed
+    assert count == ("SELECT COUNT(*) FROM `snapshots`", [])
+    assert data == ("SELECT * FROM `snapshots` LIMIT %s OFFSET %s", [10, 20])
+    assert page == {"columns": ["id", "title", "note"], "rows": [[1, "a", None]], "total": 42}
+
+
+def test_keyset_on_primary_key(app_module, fake_db):
+    conn = fake_db([[(5, "b", None)]], ("id", "title", "note"), SCHEMA)
+    page = load(app_module, after_pk="4", order_dir="desc")
+    # no COUNT(*) on keyset pages
+    assert conn.cur.executed == [
+        ("SELECT * FROM `snapshots` WHERE `id` < %s ORDER BY `id` DESC LIMIT %s", ["4", 10]),
+    ]
+    assert page["total"] is None
+
+
+def test_keyset_with_order_by(app_module, fake_db):
+    conn = fake_db([[]], ("id", "title", "note"), SCHEMA)
+    load(app_module, order_by="title", after="m", after_pk="7")
+    assert conn.cur.executed == [(
+        "SELECT * FROM `snapshots` WHERE (`title`, `id`) > (%s, %s)"
+        " ORDER BY `title` ASC, `id` ASC LIMIT %s",
+        ["m", "7", 10],
+    )]
+
+
+def test_keyset_with_search(app_module, fake_db):
+    conn = fake_db([[]], ("id", "title", "note"), SCHEMA)
+    load(app_module, order_by="title", after="m", after_pk="7", search="x")
+    assert conn.cur.executed == [(
+        "SELECT * FROM `snapshots` WHERE (`title` LIKE %s OR `note` LIKE %s)"
+        " AND (`title`, `id`) > (%s, %s) ORDER BY `title` ASC, `id` ASC LIMIT %s",
+        ["%x%", "%x%", "m", "7", 10],
+    )]
+
+
+@pytest.mark.parametrize("kwargs, detail", [
+    (dict(order_by="note", after="m"), "NOT NULL"),
+    (dict(order_by="title"), "after is required"),
+])
+def test_keyset_rejects_bad_order_by(app_module, fake_db, kwargs, detail):
+    conn = fake_db([[]], (), SCHEMA)
+    with pytest.raises(HTTPException) as exc:
+        load(app_module, after_pk="7", **kwargs)
+    assert exc.value.status_code == 400 and detail in exc.value.detail
+    assert conn.closed == 1
+
+
+def test_header_comes_from_live_query(app_module, fake_db):
+    # schema cache is stale: a column was added since it was read
+    fake_db([[(1,)], [(1, "a", None, 3)]], ("id", "title", "note", "added"), SCHEMA)
+    assert load(app_module)["columns"] == ["id", "title", "note", "added"]
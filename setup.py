@@ -8,7 +8,7 @@ setup(
         "pywinctl",
         "pyautogui",
         "fastapi",
-        "uvicorn",
+        "uvicorn[standard]",
     ],
     entry_points={
         "console_scripts": [